@@ -1,9 +1,19 @@
+import asyncio
+import functools
 import logging
 import os
-import json
 import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
 from dotenv import load_dotenv
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 from livekit import rtc
 from livekit.agents import (
     AgentServer,
@@ -13,7 +23,7 @@ from livekit.agents import (
     cli,
     room_io,
 )
-from livekit.plugins import noise_cancellation, silero, deepgram, google, openai, bey
+from livekit.plugins import noise_cancellation, silero, deepgram, google
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 from agent.tools import VoiceAppointmentAgent
@@ -25,14 +35,18 @@ logging.basicConfig(
     datefmt="%H:%M:%S",
 )
 
-# Silence noisy loggers
-logging.getLogger("pymongo").setLevel(logging.WARNING)
-logging.getLogger("pymongo.connection").setLevel(logging.WARNING)
-logging.getLogger("pymongo.command").setLevel(logging.WARNING)
-logging.getLogger("pymongo.topology").setLevel(logging.WARNING)
-logging.getLogger("pymongo.serverSelection").setLevel(logging.WARNING)
-logging.getLogger("livekit.plugins.turn_detector").setLevel(logging.WARNING)
-logging.getLogger("livekit.plugins.silero").setLevel(logging.WARNING)
+# Silence noisy loggers below WARNING; warnings and errors still propagate to
+# the root handler
+for _name in (
+    "pymongo",
+    "pymongo.connection",
+    "pymongo.command",
+    "pymongo.topology",
+    "pymongo.serverSelection",
+    "livekit.plugins.turn_detector",
+    "livekit.plugins.silero",
+):
+    logging.getLogger(_name).setLevel(logging.WARNING)
 
 logger = logging.getLogger("agent")
 
@@ -41,47 +55,196 @@ load_dotenv(".env.local")
 
 
 livekit_url = os.getenv("LIVEKIT_URL")
+BEY_API_KEY = os.getenv("BEY_API_KEY")
+BEY_AVATAR_ID = os.getenv("BEY_AVATAR_ID")
+
+# BEY expects the LiveKit URL in WebSocket form; it is static per process
+bey_livekit_url = (
+    livekit_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+    if livekit_url
+    else None
+)
+
+# Opt-in eager task execution (Python 3.12+): tasks that finish without
+# suspending skip the event-loop round-trip
+_EAGER_TASKS = (
+    os.getenv("AGENT_EAGER_TASKS", "false").lower() == "true"
+    and hasattr(asyncio, "eager_task_factory")
+)
+
+# Deepgram keyterm boosts, static for the life of the process
+_DG_KEYTERMS = (
+    "appointment",
+    "book",
+    "booking",
+    "reschedule",
+    "cancel",
+    "phone number",
+    "tomorrow",
+)
+
+# Noise-cancellation options are plain descriptors, so one instance of each
+# can be shared by every participant instead of being rebuilt per join
+_NC_BVC = noise_cancellation.BVC()
+_NC_SIP = noise_cancellation.BVCTelephony()
+_SIP_KIND = rtc.ParticipantKind.PARTICIPANT_KIND_SIP
 
 
+def _nc_dispatch(params):
+    """Pick telephony noise cancellation for SIP callers, BVC otherwise."""
+    return _NC_SIP if params.participant.kind == _SIP_KIND else _NC_BVC
+
+
+_ROOM_OPTIONS = room_io.RoomOptions(
+    audio_input=room_io.AudioInputOptions(noise_cancellation=_nc_dispatch),
+    text_output=True,
+)
+
+
+@dataclass(frozen=True)
+class LLMConfig:
+    """LLM settings, read from the environment once at import."""
+
+    provider: str
+    gemini_model: str
+    openai_model: str
+    cerebras_model: str
+    cerebras_temperature: float
+    cerebras_parallel_tool_calls: bool
+    cerebras_tool_choice: str
+
+    @classmethod
+    def from_env(cls) -> "LLMConfig":
+        return cls(
+            provider=os.getenv("LLM_PROVIDER", "gemini").lower(),
+            gemini_model=os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite"),
+            openai_model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            cerebras_model=os.getenv("CEREBRAS_MODEL", "llama3.1-8b"),
+            cerebras_temperature=float(os.getenv("CEREBRAS_TEMPERATURE", "0.4")),
+            cerebras_parallel_tool_calls=(
+                os.getenv("CEREBRAS_PARALLEL_TOOL_CALLS", "true").lower() == "true"
+            ),
+            cerebras_tool_choice=os.getenv("CEREBRAS_TOOL_CHOICE", "auto"),
+        )
+
+
+LLM_CONFIG = LLMConfig.from_env()
+
+
+def _cerebras_llm(config: LLMConfig):
+    from livekit.plugins import openai
+
+    logger.info("[LLM] Using Cerebras: %s", config.cerebras_model)
+    return openai.LLM.with_cerebras(
+        model=config.cerebras_model,
+        temperature=config.cerebras_temperature,
+        parallel_tool_calls=config.cerebras_parallel_tool_calls,
+        tool_choice=config.cerebras_tool_choice,
+    )
+
+
+def _openai_llm(config: LLMConfig):
+    from livekit.plugins import openai
+
+    logger.info("[LLM] Using OpenAI: %s", config.openai_model)
+    return openai.LLM(model=config.openai_model)
+
+
+def _gemini_llm(config: LLMConfig):
+    logger.info("[LLM] Using Gemini: %s", config.gemini_model)
+    return google.LLM(model=config.gemini_model)
+
+
+_LLM_FACTORIES = {
+    "cerebras": _cerebras_llm,
+    "openai": _openai_llm,
+    "gemini": _gemini_llm,
+}
+
+if LLM_CONFIG.provider not in _LLM_FACTORIES:
+    logger.warning(
+        "[LLM] Unknown provider '%s', defaulting to Gemini", LLM_CONFIG.provider
+    )
+_LLM_FACTORY = _LLM_FACTORIES.get(LLM_CONFIG.provider, _gemini_llm)
+
+
+@functools.lru_cache(maxsize=1)
 def get_llm_instance():
     """Get LLM instance based on environment configuration."""
-    provider = "gemini"
+    return _LLM_FACTORY(LLM_CONFIG)
 
-    if provider == "cerebras":
-        model = os.getenv("CEREBRAS_MODEL", "llama3.1-8b")
-        temperature = float(os.getenv("CEREBRAS_TEMPERATURE", "0.4"))
-        parallel_tool_calls = (
-            os.getenv("CEREBRAS_PARALLEL_TOOL_CALLS", "true").lower() == "true"
-        )
-        tool_choice = os.getenv("CEREBRAS_TOOL_CHOICE", "auto")
-        logger.info(f"[LLM] Using Cerebras: {model}")
-        return openai.LLM.with_cerebras(
-            model=model,
-            temperature=temperature,
-            parallel_tool_calls=parallel_tool_calls,
-            tool_choice=tool_choice,
-        )
 
-    elif provider == "openai":
-        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        logger.info(f"[LLM] Using OpenAI: {model}")
-        return openai.LLM(model=model)
+def _freeze(value: Any) -> Any:
+    """Recursively make parsed JSON read-only (dicts to mappingproxy, lists to tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
+class RoomMetadata:
+    """Typed view of the metadata the session API attaches to each room.
+
+    Instances are cached and shared across sessions, so user_context is
+    stored read-only.
+    """
 
-    elif provider == "gemini":
-        model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite")
-        logger.info(f"[LLM] Using Gemini: {model}")
-        return google.LLM(model=model)
+    user_context: Optional[Mapping[str, Any]] = None
+    use_avatar: bool = False
 
-    else:
-        logger.warning(f"[LLM] Unknown provider '{provider}', defaulting to Gemini")
-        return google.LLM(model="gemini-2.0-flash-lite")
+
+@functools.lru_cache(maxsize=32)
+def _parse_room_metadata(raw: str) -> RoomMetadata:
+    """Parse room metadata; rooms created by the API share identical payloads."""
+    data = json_loads(raw)
+    return RoomMetadata(
+        user_context=_freeze(data.get("user_context")),
+        use_avatar=bool(data.get("use_avatar", False)),
+    )
 
 
 server = AgentServer()
 
 
+def _load_vad():
+    """Load Silero VAD with its default thresholds.
+
+    End-of-turn timing is left to the turn detector and endpointing delays;
+    shortening silence/padding here clips speech on ordinary pauses.
+    """
+    return silero.VAD.load()
+
+
+def _warmup_vad(vad, seconds: float = 1.0) -> None:
+    """Run a short buffer through the VAD so the ONNX kernels are initialized
+    before the first real audio frame arrives."""
+    try:
+        import numpy as np
+        from livekit.plugins.silero import onnx_model
+
+        model = onnx_model.OnnxModel(onnx_session=vad._onnx_session, sample_rate=16000)
+        window = np.zeros(model.window_size_samples, dtype=np.float32)
+        for _ in range(int(16000 * seconds) // model.window_size_samples):
+            model(window)
+    except Exception as e:
+        logger.warning("[Prewarm] VAD warmup skipped: %s", e)
+
+
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    """Load models and clients once per worker process, off the session hot path."""
+    logger.info("[Avatar] Avatar configured: %s", bool(BEY_API_KEY and BEY_AVATAR_ID))
+    proc.userdata["vad"] = _load_vad()
+    _warmup_vad(proc.userdata["vad"])
+    proc.userdata["llm"] = get_llm_instance()
+    proc.userdata["turn_detector"] = MultilingualModel()
+    proc.userdata["stt"] = deepgram.STTv2(
+        model="flux-general-en",
+        eager_eot_threshold=0.4,
+        keyterms=_DG_KEYTERMS,
+    )
+    proc.userdata["tts"] = deepgram.TTS(model="aura-2-asteria-en")
 
 
 server.setup_fnc = prewarm
@@ -89,8 +252,21 @@ server.setup_fnc = prewarm
 
 @server.rtc_session(agent_name="voice-appointment-agent")
 async def voice_appointment_agent(ctx: JobContext):
+    if _EAGER_TASKS:
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
     try:
-        logger.info(f"[Session] Connecting to room: {ctx.room.name}")
+        # Bind room handlers before connecting so participants that join
+        # during the connect window are not missed
+        @ctx.room.on("participant_connected")
+        def on_participant_connected(participant: rtc.RemoteParticipant):
+            logger.info("[Room] Participant joined: %s", participant.identity)
+
+        @ctx.room.on("participant_disconnected")
+        def on_participant_disconnected(participant: rtc.RemoteParticipant):
+            logger.info("[Room] Participant left: %s", participant.identity)
+
+        logger.info("[Session] Connecting to room: %s", ctx.room.name)
         await ctx.connect()
 
         # Logging setup
@@ -98,65 +274,46 @@ async def voice_appointment_agent(ctx: JobContext):
             "room": ctx.room.name,
         }
 
-        @ctx.room.on("participant_connected")
-        def on_participant_connected(participant: rtc.RemoteParticipant):
-            logger.info(f"[Room] Participant joined: {participant.identity}")
-
-        @ctx.room.on("participant_disconnected")
-        def on_participant_disconnected(participant: rtc.RemoteParticipant):
-            logger.info(f"[Room] Participant left: {participant.identity}")
-
-        server_vad = silero.VAD.load()
-        turn_detector = MultilingualModel()
+        # Reuse the handles loaded once per worker in prewarm()
+        server_vad = ctx.proc.userdata.get("vad") or await asyncio.to_thread(_load_vad)
+        turn_detector = ctx.proc.userdata["turn_detector"]
 
         # Set up voice AI pipeline with Deepgram and configurable LLM
         session = AgentSession(
             turn_detection=turn_detector,
-            stt=deepgram.STTv2(
-                model="flux-general-en",
-                eager_eot_threshold=0.4,
-                keyterms=[
-                    "appointment",
-                    "book",
-                    "booking",
-                    "reschedule",
-                    "cancel",
-                    "phone number",
-                    "tomorrow",
-                ],
-            ),
+            stt=ctx.proc.userdata["stt"],
             vad=server_vad,
             # Use configured LLM (Gemini, Cerebras, or OpenAI)
-            llm=get_llm_instance(),
+            llm=ctx.proc.userdata["llm"],
             # Use Deepgram for TTS
-            tts=deepgram.TTS(
-                model="aura-2-asteria-en",
-            ),
+            tts=ctx.proc.userdata["tts"],
+            # Start LLM prefill speculatively while the user finishes speaking
+            preemptive_generation=True,
             min_interruption_duration=0.5,
-            min_endpointing_delay=0.5,
+            min_endpointing_delay=0.05,
             max_endpointing_delay=3.0,
             allow_interruptions=True,
-            resume_false_interruption=False,
+            false_interruption_timeout=0.6,
+            resume_false_interruption=True,
         )
 
         # Extract user context from job metadata if available
         user_context = None
         use_avatar = False
-        bey_api_key = os.getenv("BEY_API_KEY")
-        avatar_id = os.getenv("BEY_AVATAR_ID")
-        logger.info(f"[Avatar] Avatar ID: {avatar_id}")
+        bey_api_key = BEY_API_KEY
+        avatar_id = BEY_AVATAR_ID
 
         # Generate unique conversation ID for this session
-        conversation_id = str(uuid.uuid4())
-        logger.info(f"[Session] Conversation ID: {conversation_id}")
+        conversation_id = uuid.uuid4().hex
+        logger.info("[Session] Conversation ID: %s", conversation_id)
 
         if ctx.room.metadata:
             try:
-                metadata = json.loads(ctx.room.metadata)
-                user_context = metadata.get("user_context")
-                use_avatar = metadata.get("use_avatar", False)
+                metadata = _parse_room_metadata(ctx.room.metadata)
+                user_context = metadata.user_context
+                use_avatar = metadata.use_avatar
             except Exception as e:
-                logger.warning(f"[Metadata] Failed to parse: {e}")
+                logger.warning("[Metadata] Failed to parse: %s", e)
 
         # Create agent with optional user context and conversation ID
         agent = VoiceAppointmentAgent(
@@ -165,68 +322,57 @@ async def voice_appointment_agent(ctx: JobContext):
 
         # Register session event handlers for message tracking
         # Use correct LiveKit event types
+        add_message = agent.context.add_message
+
         @session.on("user_input_transcribed")
         def on_user_input_transcribed(event):
             if event.is_final:
-                logger.info(f"[User] {event.transcript}")
-                agent.context.add_message("user", event.transcript)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("[User] %s", event.transcript)
+                add_message("user", event.transcript)
 
         @session.on("conversation_item_added")
         def on_conversation_item_added(event):
             # Track messages added to conversation (for agent/assistant messages)
             item = event.item
             # Only process ChatMessage items (type == "message")
-            if hasattr(item, 'type') and item.type == "message":
-                role = item.role if hasattr(item, 'role') else None
-                # Use text_content property for cleaner extraction
-                content = item.text_content if hasattr(item, 'text_content') else None
-                
-                if role == "assistant" and content:
-                    logger.info(f"[Agent] {content}")
-                    agent.context.add_message("assistant", content)
+            if getattr(item, "type", None) != "message":
+                return
+            if getattr(item, "role", None) != "assistant":
+                return
+            # Use text_content property for cleaner extraction
+            content = getattr(item, "text_content", None)
+            if content:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("[Agent] %s", content)
+                add_message("assistant", content)
 
 
         @session.on("function_tools_executed")
         def on_function_finished(event):
             for call, output in event.zipped():
                 if output and hasattr(output, 'error') and output.error:
-                    logger.error(f"[Tool] {call.name} failed: {output.error}")
+                    logger.error("[Tool] %s failed: %s", call.name, output.error)
 
 
         avatar = None
         if bey_api_key and avatar_id and use_avatar:
             try:
-                # Convert HTTP(S) URL to WebSocket format for BEY
-                bey_url = livekit_url
-                if bey_url:
-                    if bey_url.startswith("https://"):
-                        bey_url = bey_url.replace("https://", "wss://")
-                    elif bey_url.startswith("http://"):
-                        bey_url = bey_url.replace("http://", "ws://")
+                from livekit.plugins import bey
 
                 logger.info("[Avatar] Initializing avatar...")
                 avatar = bey.AvatarSession(avatar_id=avatar_id)
-                await avatar.start(session, room=ctx.room, livekit_url=bey_url)
+                await avatar.start(session, room=ctx.room, livekit_url=bey_livekit_url)
                 logger.info("[Avatar] Started and ready")
             except Exception as e:
-                logger.error(f"[Avatar] Failed to start: {e}")
+                logger.error("[Avatar] Failed to start: %s", e)
                 avatar = None
 
         # Now start the session - avatar is already connected
         await session.start(
             agent=agent,
             room=ctx.room,
-            room_options=room_io.RoomOptions(
-                audio_input=room_io.AudioInputOptions(
-                    noise_cancellation=lambda params: (
-                        noise_cancellation.BVCTelephony()
-                        if params.participant.kind
-                        == rtc.ParticipantKind.PARTICIPANT_KIND_SIP
-                        else noise_cancellation.BVC()
-                    ),
-                ),
-                text_output=True,
-            ),
+            room_options=_ROOM_OPTIONS,
         )
 
         logger.info("[Session] Voice agent started successfully")
@@ -236,7 +382,7 @@ async def voice_appointment_agent(ctx: JobContext):
             logger.info("[Session] Avatar mode fully initialized")
 
     except Exception as e:
-        logger.error(f"[Session] Fatal error: {e}", exc_info=True)
+        logger.exception("[Session] Fatal error: %s", e)
         raise
 
 
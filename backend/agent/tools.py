@@ -1,10 +1,21 @@
+import asyncio
+import functools
 import logging
+import re
 import yaml
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from time import monotonic
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass, field
 
 import dateparser
+from pymongo.errors import DuplicateKeyError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from livekit.agents import (
     Agent,
@@ -13,13 +24,33 @@ from livekit.agents import (
     get_job_context,
 )
 
-from core.database import DatabaseManager
-from core.models import Appointment
+from core.database import get_db
+from core.models import Appointment, AppointmentStatus
 from core.summary_service import ConversationTracker, SummaryGenerator
 
 logger = logging.getLogger("agent.tools")
 
 
+if orjson is not None:
+
+    def _dumps(payload: Dict) -> bytes:
+        # orjson encodes datetimes natively; naive values stay naive, since
+        # appointment datetimes are local wall-clock times, not UTC
+        return orjson.dumps(payload, default=str)
+
+else:
+    import json
+
+    def _json_default(value):
+        """Match orjson: datetimes as ISO 8601, anything else (e.g. ObjectId) as str."""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def _dumps(payload: Dict) -> bytes:
+        return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
 # Mock calendar for February 2026 - slots available for booking
 MOCK_CALENDAR_2026_FEB = {
     "2026-02-05": ["12:00", "15:00", "17:00", "18:00", "19:00"],
@@ -41,104 +72,124 @@ MOCK_CALENDAR_2026_FEB = {
 }
 
 # Default slots when date not in calendar
-DEFAULT_SLOTS = ["12:00", "15:00", "17:00", "18:00", "19:00"]
+DEFAULT_SLOTS = ("12:00", "15:00", "17:00", "18:00", "19:00")
+
+# How long booked-slot lookups are reused within a conversation; our own
+# writes invalidate explicitly and the unique slot index catches the rest
+SLOT_CACHE_TTL_SECONDS = 30.0
+
+# How long a user's prefetched appointment list is served without a DB read
+APPOINTMENTS_CACHE_TTL_SECONDS = 15.0
+
+# English names for spoken dates, avoiding locale-dependent strftime
+_WEEKDAYS = (
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+)
+_MONTHS = (
+    None,
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
 
+# Tomorrow's ISO date, recomputed only when the local day changes
+_TOMORROW_CACHE = {"ordinal": None, "iso": None}
+
+# Number of recent messages kept for context re-injection
+MAX_HISTORY_SIZE = 5
+
+# Constant fields of each tool's frontend event, copied and filled per call
+_TOOL_EVENT_TEMPLATES = {
+    name: {"type": "tool_call", "tool_name": name, "status": "success"}
+    for name in (
+        "identify_user",
+        "set_user_name",
+        "add_user_preference",
+        "fetch_slots",
+        "book_appointment",
+        "retrieve_appointments",
+        "cancel_appointment",
+        "modify_appointment",
+    )
+}
 
-@dataclass
-class UserData:
-    """User data that persists throughout the conversation"""
+# Strips everything but digits from spoken phone numbers
+_NON_DIGIT = re.compile(r"\D+")
 
-    user_id: Optional[str] = None
-    user_phone: Optional[str] = None
-    user_name: Optional[str] = None
-    identified: bool = False
+# ISO dates, accepted by _normalize_date without dateparser
+_DATE_RE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}").fullmatch
 
-    # Conversation tracking
-    conversation_id: Optional[str] = None
+# dateparser is the slow fallback for free-form phrases; it runs off the loop
+_DATEPARSER_SETTINGS = {
+    "PREFER_DATES_FROM": "future",
+    "RETURN_AS_TIMEZONE_AWARE": False,
+}
 
-    # User preferences
-    preferences: List[str] = field(default_factory=list)
+# Common spoken clock times ("3 PM", "3:30pm", "15:00"), parsed without dateparser
+_CLOCK_TIME_RE = re.compile(
+    r"([0-9]{1,2})(?::([0-9]{2}))?\s*(?:([ap])\.?\s*m\.?)?", re.IGNORECASE
+).fullmatch
 
-    # Pending actions
-    pending_appointment: Optional[Dict] = None
 
-    # Message tracking
-    last_user_message: Optional[str] = None
-    last_agent_message: Optional[str] = None
-    last_tool_call: Optional[Dict] = None
-    message_history: List[Dict[str, str]] = field(default_factory=list)
-    max_history_size: int = 5
+def _spoken_date(dt) -> str:
+    """Format a date as e.g. 'Tuesday, February 10'."""
+    return f"{_WEEKDAYS[dt.weekday()]}, {_MONTHS[dt.month]} {dt.day:02d}"
 
-    # Enhanced summary tracker
-    tracker: Optional[ConversationTracker] = None
 
-    def __post_init__(self):
-        if self.tracker is None:
-            self.tracker = ConversationTracker()
+@functools.lru_cache(maxsize=128)
+def _spoken_date_from_iso(date_str: str) -> str:
+    """Spoken form of a YYYY-MM-DD string; a session revisits the same few dates."""
+    return _spoken_date(datetime.fromisoformat(date_str))
 
-    def add_message(self, role: str, content: str) -> None:
-        """Add a message to history, keeping only the last N messages."""
-        if not content or not content.strip():
-            return
-        self.message_history.append({"role": role, "content": content.strip()})
-        # Keep only last N messages
-        if len(self.message_history) > self.max_history_size:
-            self.message_history = self.message_history[-self.max_history_size :]
-        # Also update last message shortcuts
-        if role == "user":
-            self.last_user_message = content.strip()
-        elif role == "assistant":
-            self.last_agent_message = content.strip()
 
-    def get_recent_history(self) -> str:
-        """Get formatted recent message history for LLM context."""
-        if not self.message_history:
-            return ""
-        lines = ["Recent conversation:"]
-        for msg in self.message_history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            lines.append(f"- {role}: {msg['content']}")
-        return "\n".join(lines)
+@functools.lru_cache(maxsize=512)
+def _spoken_datetime(dt: datetime) -> str:
+    """Format a datetime as e.g. 'Tuesday, February 10 at 03:00 PM'.
 
-    def summarize(self) -> str:
-        """Generate YAML summary for LLM context - performs better than JSON"""
-        data = {
-            "user_id": self.user_id or "unknown",
-            "user_name": self.user_name or "unknown",
-            "phone": self.user_phone or "unknown",
-            "identified": self.identified,
-            "has_pending_appointment": self.pending_appointment is not None,
-        }
-        if self.preferences:
-            data["preferences"] = self.preferences
-        return yaml.dump(data, default_flow_style=False)
+    Appointments sit on a handful of calendar slots, so the same datetimes
+    recur across retrieve, cancel and modify replies.
+    """
+    meridiem = "AM" if dt.hour < 12 else "PM"
+    return f"{_spoken_date(dt)} at {dt.hour % 12 or 12:02d}:{dt.minute:02d} {meridiem}"
 
 
-class VoiceAppointmentAgent(Agent):
-    def __init__(
-        self,
-        user_context: Optional[Dict] = None,
-        conversation_id: Optional[str] = None,
-    ) -> None:
-        self.user_data = UserData()
+@functools.lru_cache(maxsize=64)
+def _time_ampm(time_24h: str) -> str:
+    """Format an HH:MM time as e.g. '3 PM'; unparseable input is returned as-is."""
+    try:
+        hour, minute = map(int, time_24h.split(":"))
+    except Exception:
+        return time_24h
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return time_24h
+    return f"{hour % 12 or 12} {'AM' if hour < 12 else 'PM'}"
 
-        # Set conversation ID
-        if conversation_id:
-            self.user_data.conversation_id = conversation_id
 
-        # Get today's date context
-        today = datetime.now().date().isoformat()
-        tomorrow = (datetime.now().date() + timedelta(days=1)).isoformat()
+@functools.lru_cache(maxsize=64)
+def _spoken_times(times: Tuple[str, ...]) -> str:
+    """Comma-joined spoken slot list; the calendar only yields a few distinct sets."""
+    return ", ".join(_time_ampm(t) for t in times)
 
-        # Build instructions with date context
-        base_instructions = f"""# Identity
 
-You are Alya, a friendly and efficient appointment booking assistant. Your primary role is to help users schedule, view, modify, and cancel appointments through natural voice conversation.
+# Static system prompt; per-session date and user context are appended after it
+_INSTRUCTIONS = """# Identity
 
-# Current Date Context
-- Today's date: {today}
-- Tomorrow's date: {tomorrow}
-- When users say "tomorrow", they mean {tomorrow}.
+You are Alya, a friendly and efficient appointment booking assistant. Your primary role is to help users schedule, view, modify, and cancel appointments through natural voice conversation.
 
 # Core Responsibilities
 
@@ -200,6 +251,111 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
 - NEVER ask which appointment when these relative terms are used—let the tool handle it automatically.
 """
 
+
+@dataclass(slots=True, frozen=True)
+class Message:
+    """A single conversation turn kept in the recent history"""
+
+    role: str
+    content: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+@dataclass(slots=True)
+class UserData:
+    """User data that persists throughout the conversation"""
+
+    user_id: Optional[str] = None
+    user_phone: Optional[str] = None
+    user_name: Optional[str] = None
+    identified: bool = False
+
+    # Conversation tracking
+    conversation_id: Optional[str] = None
+
+    # User preferences
+    preferences: List[str] = field(default_factory=list)
+
+    # Pending actions
+    pending_appointment: Optional[Dict] = None
+
+    # Message tracking
+    last_user_message: Optional[str] = None
+    last_agent_message: Optional[str] = None
+    last_tool_call: Optional[Dict] = None
+    message_history: Deque[Message] = field(
+        default_factory=lambda: deque(maxlen=MAX_HISTORY_SIZE)
+    )
+
+    # Enhanced summary tracker
+    tracker: ConversationTracker = field(default_factory=ConversationTracker)
+
+    def add_message(self, role: str, content: str) -> None:
+        """Add a message to history, keeping only the last N messages."""
+        if not content or not content.strip():
+            return
+        content = content.strip()
+        # Bounded deque drops the oldest message once full
+        self.message_history.append(Message(role=role, content=content))
+        # Also update last message shortcuts
+        if role == "user":
+            self.last_user_message = content
+        elif role == "assistant":
+            self.last_agent_message = content
+
+    def get_recent_history(self) -> str:
+        """Get formatted recent message history for LLM context."""
+        if not self.message_history:
+            return ""
+        lines = ["Recent conversation:"]
+        for msg in self.message_history:
+            role = "User" if msg.role == "user" else "Assistant"
+            lines.append(f"- {role}: {msg.content}")
+        return "\n".join(lines)
+
+    def summarize(self) -> str:
+        """Generate YAML summary for LLM context - performs better than JSON"""
+        data = {
+            "user_id": self.user_id or "unknown",
+            "user_name": self.user_name or "unknown",
+            "phone": self.user_phone or "unknown",
+            "identified": self.identified,
+            "has_pending_appointment": self.pending_appointment is not None,
+        }
+        if self.preferences:
+            data["preferences"] = self.preferences
+        return yaml.dump(data, default_flow_style=False)
+
+
+class VoiceAppointmentAgent(Agent):
+    def __init__(
+        self,
+        user_context: Optional[Dict] = None,
+        conversation_id: Optional[str] = None,
+    ) -> None:
+        self.user_data = UserData()
+
+        # Set conversation ID
+        if conversation_id:
+            self.user_data.conversation_id = conversation_id
+
+        # Get today's date context
+        today = datetime.now().date().isoformat()
+        tomorrow = (datetime.now().date() + timedelta(days=1)).isoformat()
+
+        base_instructions = _INSTRUCTIONS
+
+        # Dynamic context goes last so the static prefix stays
+        # byte-identical across sessions and hits provider prompt caching
+        base_instructions += f"""
+# Current Date Context
+- Today's date: {today}
+- Tomorrow's date: {tomorrow}
+- When users say "tomorrow", they mean {tomorrow}.
+"""
+
         # Add user information section if provided
         if user_context:
             user_info_parts = ["\n\n# Known User Information\n"]
@@ -224,7 +380,21 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         super().__init__(instructions=base_instructions)
 
         # Create database manager for this agent
-        self.db = DatabaseManager()
+        self.db = get_db()
+
+        # Background tasks (frontend events) kept alive until they finish
+        self._bg_tasks: Set[asyncio.Task] = set()
+
+        # Booked slots per date, reused across tool calls within a booking flow
+        self._slot_cache: Dict[str, Tuple[float, Set[str]]] = {}
+        self._slot_locks: Dict[str, asyncio.Lock] = {}
+
+        # User's appointments, prefetched once identify_user succeeds
+        self._appointments_cache: Optional[Tuple[float, List[Appointment]]] = None
+        self._appointments_prefetch: Optional[asyncio.Task] = None
+
+        # Room for data events, resolved on first publish
+        self._room = None
 
         # Set conversation_id on tracker for proper tracking
         self.user_data.tracker.conversation_id = self.user_data.conversation_id
@@ -251,7 +421,8 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 content=recent_history,
             )
             logger.debug(
-                f"[Context] Injected {len(self.user_data.message_history)} messages into context"
+                "[Context] Injected %d messages into context",
+                len(self.user_data.message_history),
             )
 
         await self.update_chat_ctx(chat_ctx)
@@ -259,25 +430,99 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         # Generate initial greeting via LLM (natural variation)
         self.session.generate_reply(tool_choice="none")
 
-    def _normalize_date(self, date_str: Optional[str]) -> Optional[str]:
+    async def _get_booked_slots(self, date: str) -> Set[str]:
+        """Get booked slots for a date, served from a short-lived cache."""
+        cached = self._slot_cache.get(date)
+        if cached and monotonic() - cached[0] < SLOT_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        # One fetch per date at a time; concurrent callers reuse its result
+        lock = self._slot_locks.setdefault(date, asyncio.Lock())
+        async with lock:
+            cached = self._slot_cache.get(date)
+            if cached and monotonic() - cached[0] < SLOT_CACHE_TTL_SECONDS:
+                return cached[1]
+
+            # A failed read raises here and is never cached
+            booked_slots = await self.db.get_booked_slots(date)
+            self._slot_cache[date] = (monotonic(), booked_slots)
+            return booked_slots
+
+    def _invalidate_booked_slots(self, *dates: Optional[str]) -> None:
+        """Drop cached booked slots after a write touching these dates."""
+        for date in dates:
+            self._slot_cache.pop(date, None)
+
+    async def _prefetch_appointments(self) -> None:
+        """Load the user's upcoming appointments ahead of the next tool call."""
+        task = asyncio.current_task()
+        appointments = await self.db.get_upcoming_appointments(self.context.user_id)
+        # A write since this prefetch started makes its result stale
+        if self._appointments_prefetch is task:
+            self._appointments_cache = (monotonic(), appointments)
+
+    async def _get_upcoming_appointments(self) -> List[Appointment]:
+        """Get the user's upcoming appointments, reusing a fresh prefetch."""
+        prefetch = self._appointments_prefetch
+        if prefetch and not prefetch.done():
+            await asyncio.wait({prefetch})
+
+        cached = self._appointments_cache
+        if cached and monotonic() - cached[0] < APPOINTMENTS_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        appointments = await self.db.get_upcoming_appointments(self.context.user_id)
+        self._appointments_cache = (monotonic(), appointments)
+        return appointments
+
+    def _invalidate_appointments(self) -> None:
+        """Drop the cached appointment list after a booking change."""
+        self._appointments_cache = None
+        self._appointments_prefetch = None
+
+    async def _normalize_date(self, date_str: Optional[str]) -> Optional[str]:
         if not date_str:
             return None
 
-        parsed = dateparser.parse(
-            date_str,
-            settings={"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False},
+        # Fast paths for the inputs the LLM usually sends
+        text = date_str.strip().lower()
+        if _DATE_RE(text):
+            try:
+                return datetime.fromisoformat(text).date().isoformat()
+            except ValueError:
+                return None
+        if text == "today":
+            return self._get_current_date()
+        if text == "tomorrow":
+            return self._tomorrow_date()
+
+        parsed = await asyncio.to_thread(
+            dateparser.parse, date_str, settings=_DATEPARSER_SETTINGS
         )
         if not parsed:
             return None
         return parsed.date().isoformat()
 
-    def _normalize_time(self, time_str: Optional[str]) -> Optional[str]:
+    async def _normalize_time(self, time_str: Optional[str]) -> Optional[str]:
         if not time_str:
             return None
 
-        parsed = dateparser.parse(
-            time_str,
-            settings={"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False},
+        # Fast path for plain clock times; needs minutes or AM/PM to be unambiguous
+        match = _CLOCK_TIME_RE(time_str.strip())
+        if match and (match.group(2) or match.group(3)):
+            hour = int(match.group(1))
+            minute = int(match.group(2) or 0)
+            meridiem = match.group(3)
+            if meridiem:
+                if not 1 <= hour <= 12:
+                    return None
+                hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+            if hour > 23 or minute > 59:
+                return None
+            return f"{hour:02d}:{minute:02d}"
+
+        parsed = await asyncio.to_thread(
+            dateparser.parse, time_str, settings=_DATEPARSER_SETTINGS
         )
         if not parsed:
             return None
@@ -289,7 +534,13 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
 
     def _tomorrow_date(self) -> str:
         """Return tomorrow's date"""
-        return (datetime.now().date() + timedelta(days=1)).isoformat()
+        ordinal = datetime.now().toordinal()
+        if _TOMORROW_CACHE["ordinal"] != ordinal:
+            _TOMORROW_CACHE.update(
+                ordinal=ordinal,
+                iso=datetime.fromordinal(ordinal + 1).date().isoformat(),
+            )
+        return _TOMORROW_CACHE["iso"]
 
     def _get_available_slots_for_date(self, date: str) -> List[str]:
         """Get available time slots from mock calendar"""
@@ -308,36 +559,54 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         available_times = self._get_available_slots_for_date(date)
         return time in available_times
 
+    def _available_slots(
+        self, date: str, booked_slots: Set[str]
+    ) -> List[Dict[str, str]]:
+        """Calendar slots for a date whose time is not in the booked set"""
+        return [
+            slot
+            for slot in self._allowed_slots_for_date(date)
+            if slot["time"] not in booked_slots
+        ]
+
     def _format_slots(self, slots: List[Dict[str, str]]) -> str:
         if not slots:
             return ""
-        return ", ".join([self._format_time_ampm(slot["time"]) for slot in slots])
+        return _spoken_times(tuple(slot["time"] for slot in slots))
 
     def _format_time_ampm(self, time_24h: str) -> str:
-        try:
-            return datetime.strptime(time_24h, "%H:%M").strftime("%-I %p")
-        except Exception:
-            return time_24h
+        return _time_ampm(time_24h)
+
+    def _format_spoken_date(self, date_str: str) -> str:
+        """Format a YYYY-MM-DD date as e.g. 'Tuesday, February 10'."""
+        return _spoken_date_from_iso(date_str)
 
     def _get_room_from_context(self, context: RunContext):
         """Best-effort room access for sending data events."""
+        if self._room is not None:
+            return self._room
+
+        room = None
         try:
             session = getattr(context, "session", None)
-            if session and getattr(session, "room", None):
-                return session.room
+            if session:
+                room = getattr(session, "room", None)
         except Exception:
             pass
 
-        try:
-            return get_job_context().room
-        except Exception:
-            return None
+        if room is None:
+            try:
+                room = get_job_context().room
+            except Exception:
+                return None
+
+        # The room is fixed for the life of the session
+        self._room = room
+        return room
 
     async def _publish_data_event(self, context: RunContext, payload: Dict):
         """Publish a JSON event to the LiveKit data channel."""
         try:
-            import json
-
             room = self._get_room_from_context(context)
 
             if not room:
@@ -345,24 +614,36 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 return
 
             await room.local_participant.publish_data(
-                json.dumps(payload, default=str).encode("utf-8"),
+                _dumps(payload),
                 reliable=True,
             )
         except Exception as e:
-            logger.error(f"[DataEvent] Error: {e}")
+            logger.error("[DataEvent] Error: %s", e)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a coroutine in the background, keeping a reference until it ends."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
 
-    async def _send_tool_call_event(
+    async def _drain_background_tasks(self) -> None:
+        """Wait for in-flight background work such as frontend events."""
+        if self._bg_tasks:
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+
+    def _send_tool_call_event(
         self, context: RunContext, tool_name: str, parameters: Dict, result: str
-    ):
-        """Send tool call event to frontend for display"""
-        event_data = {
-            "type": "tool_call",
-            "tool_name": tool_name,
-            "parameters": parameters,
-            "result": result,
-            "timestamp": datetime.utcnow().isoformat(),
-            "status": "success",
-        }
+    ) -> None:
+        """Send tool call event to frontend for display without blocking the tool"""
+        template = _TOOL_EVENT_TEMPLATES.get(tool_name)
+        if template is None:
+            template = {"type": "tool_call", "tool_name": tool_name, "status": "success"}
+        event_data = template.copy()
+        event_data["parameters"] = parameters
+        event_data["result"] = result
+        # Serialized as ISO 8601 when the event is published
+        event_data["timestamp"] = datetime.utcnow()
 
         self.context.last_tool_call = {
             "tool_name": tool_name,
@@ -371,8 +652,16 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             "timestamp": event_data["timestamp"],
         }
 
-        await self._publish_data_event(context, event_data)
-        logger.debug(f"[Tool] {tool_name} | {parameters}")
+        self._spawn(self._publish_data_event(context, event_data))
+        logger.debug("[Tool] %s | %s", tool_name, parameters)
+
+    async def _respond(
+        self, context: RunContext, tool_name: str, parameters: Dict, text: str
+    ) -> None:
+        """Report a tool result to the frontend and speak it to the user."""
+        # The event publish is scheduled first so it overlaps the speech
+        self._send_tool_call_event(context, tool_name, parameters, text)
+        await self._say_response(context, text)
 
     async def _say_response(self, context: RunContext, text: str) -> None:
         """Speak the tool response verbatim to avoid LLM paraphrasing."""
@@ -382,7 +671,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 await session.say(text, allow_interruptions=True)
                 self.context.last_agent_message = text
         except Exception as e:
-            logger.error(f"[Speech] Error: {e}")
+            logger.error("[Speech] Error: %s", e)
 
     @function_tool
     async def identify_user(self, context: RunContext, phone_number: str) -> str:
@@ -391,18 +680,25 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         Args:
             phone_number: The user's phone number for identification
         """
-        logger.debug(f"[identify_user] {phone_number}")
+        logger.debug("[identify_user] %s", phone_number)
 
         # Check if already identified - don't re-identify
         if self.context.identified and self.context.user_phone:
             logger.debug(
-                f"[identify_user] Already identified as {self.context.user_name}"
+                "[identify_user] Already identified as %s", self.context.user_name
             )
             return f"User already identified as {self.context.user_name}. Do not ask for phone again."
 
+        # Let the UI show progress while the lookup is in flight
+        self._spawn(
+            self._publish_data_event(
+                context, {"type": "tool_call_started", "tool_name": "identify_user"}
+            )
+        )
+
         try:
             # Clean phone number
-            clean_phone = "".join(filter(str.isdigit, phone_number))
+            clean_phone = _NON_DIGIT.sub("", phone_number)
 
             user = await self.db.get_user_by_phone(clean_phone)
             if user:
@@ -441,6 +737,10 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                     {"returning_user": False, "new_user_created": True},
                 )
 
+            # Warm the appointment list while the user answers
+            self._invalidate_appointments()
+            self._appointments_prefetch = self._spawn(self._prefetch_appointments())
+
             # Determine response for UI and LLM
             has_name = self.context.user_name and self.context.user_name != "User"
 
@@ -453,7 +753,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 llm_response = f"New user created with phone {clean_phone}. NO name on file yet. You MUST ask the user 'What's your name?' and WAIT for their response before calling set_user_name. Do NOT assume or generate a name. Do NOT ask for phone again."
 
             # Send tool call event to frontend with UI-friendly message
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context, "identify_user", {"phone_number": phone_number}, ui_response
             )
 
@@ -461,7 +761,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return llm_response
 
         except Exception as e:
-            logger.error(f"[identify_user] Error: {e}")
+            logger.error("[identify_user] Error: %s", e)
             response = "Sorry, I couldn't find that number. Can you try again?"
             await self._say_response(context, response)
             return response
@@ -473,7 +773,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         Args:
             name: The user's name
         """
-        logger.debug(f"[set_user_name] {name}")
+        logger.debug("[set_user_name] %s", name)
 
         try:
             clean_name = name.strip()
@@ -493,7 +793,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             ui_response = f"Thanks, {clean_name}!"
             llm_response = f"User name set to {clean_name}. Check conversation history for pending requests."
 
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context, "set_user_name", {"name": clean_name}, ui_response
             )
 
@@ -501,7 +801,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return llm_response
 
         except Exception as e:
-            logger.error(f"[set_user_name] Error: {e}")
+            logger.error("[set_user_name] Error: %s", e)
             response = "Sorry, I couldn't save that name. What should I call you?"
             await self._say_response(context, response)
             return None
@@ -513,7 +813,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         Args:
             preference: The preference text to store
         """
-        logger.debug(f"[add_user_preference] {preference}")
+        logger.debug("[add_user_preference] %s", preference)
 
         try:
             clean_pref = preference.strip()
@@ -522,22 +822,21 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 await self._say_response(context, response)
                 return None
 
-            if clean_pref not in self.context.user_preferences:
-                self.context.user_preferences.append(clean_pref)
+            if clean_pref not in self.context.preferences:
+                self.context.preferences.append(clean_pref)
 
             # Track preference
             if clean_pref not in self.context.tracker.user_preferences:
                 self.context.tracker.user_preferences.append(clean_pref)
 
             response = "Got it. Anything else?"
-            await self._send_tool_call_event(
+            await self._respond(
                 context, "add_user_preference", {"preference": clean_pref}, response
             )
-            await self._say_response(context, response)
             return None
 
         except Exception as e:
-            logger.error(f"[add_user_preference] Error: {e}")
+            logger.error("[add_user_preference] Error: %s", e)
             response = "Sorry, I couldn't save that preference."
             await self._say_response(context, response)
             return None
@@ -549,39 +848,33 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
         Args:
             date: Date to check slots for (YYYY-MM-DD format). If not provided, defaults to tomorrow.
         """
-        logger.debug(f"[fetch_slots] {date or 'tomorrow'}")
+        logger.debug("[fetch_slots] %s", date or "tomorrow")
 
         try:
             # Use provided date or default to tomorrow
             normalized_date = (
-                self._normalize_date(date) if date else self._tomorrow_date()
+                await self._normalize_date(date) if date else self._tomorrow_date()
             )
 
-            allowed_slots = self._allowed_slots_for_date(normalized_date)
-            booked_slots = await self.db.get_booked_slots(normalized_date)
-            available_slots = [
-                slot
-                for slot in allowed_slots
-                if f"{normalized_date} {slot['time']}" not in booked_slots
-            ]
+            booked_slots = await self._get_booked_slots(normalized_date)
+            available_slots = self._available_slots(normalized_date, booked_slots)
 
             # Format date for human-readable response
-            date_obj = datetime.strptime(normalized_date, "%Y-%m-%d")
-            date_str = date_obj.strftime("%A, %B %d")
+            date_str = self._format_spoken_date(normalized_date)
 
             if not available_slots:
                 response = f"Sorry, {date_str} is fully booked. Would you like a different day?"
             else:
                 response = f"On {date_str}, I have {self._format_slots(available_slots)}. Which time works for you?"
 
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context, "fetch_slots", {"date": normalized_date}, response
             )
 
             return response
 
         except Exception as e:
-            logger.error(f"[fetch_slots] Error: {e}")
+            logger.error("[fetch_slots] Error: %s", e)
             response = "Can't check slots right now. Try again?"
             await self._say_response(context, response)
             return response
@@ -601,7 +894,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             time: Appointment time (HH:MM format)
             purpose: Purpose or reason for the appointment
         """
-        logger.debug(f"[book_appointment] {date} {time}")
+        logger.debug("[book_appointment] %s %s", date, time)
 
         if not self.context.user_id:
             logger.warning("[book_appointment] User not identified")
@@ -611,9 +904,9 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
 
         try:
             normalized_date = (
-                self._normalize_date(date) if date else self._tomorrow_date()
+                await self._normalize_date(date) if date else self._tomorrow_date()
             )
-            normalized_time = self._normalize_time(time)
+            normalized_time = await self._normalize_time(time)
 
             if not normalized_date or not normalized_time:
                 default_date = self._tomorrow_date()
@@ -621,26 +914,24 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                     f"I need a valid date and time. "
                     f"Which time works for you: {self._format_slots(self._allowed_slots_for_date(default_date))}?"
                 )
-                await self._send_tool_call_event(
+                await self._respond(
                     context,
                     "book_appointment",
                     {"date": date, "time": time, "purpose": purpose},
                     response,
                 )
-                await self._say_response(context, response)
                 return None
 
             if not self._is_allowed_slot(normalized_date, normalized_time):
                 # Format date for human-readable response
-                date_obj = datetime.strptime(normalized_date, "%Y-%m-%d")
-                date_str = date_obj.strftime("%A, %B %d")
+                date_str = self._format_spoken_date(normalized_date)
 
                 response = (
                     f"On {date_str}, I can do {self._format_slots(self._allowed_slots_for_date(normalized_date))}. "
                     "Which time should I book?"
                 )
 
-                await self._send_tool_call_event(
+                await self._respond(
                     context,
                     "book_appointment",
                     {
@@ -650,25 +941,39 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                     },
                     response,
                 )
-                await self._say_response(context, response)
                 return None
 
-            # Check if slot is already booked
-            datetime_str = f"{normalized_date} {normalized_time}"
-            booked_slots = await self.db.get_booked_slots(normalized_date)
+            # Create appointment; the partial unique index on (date, time)
+            # rejects the insert if the slot is already taken, and
+            # create_appointment checks statuses the index does not cover
+            appointment_data = {
+                "user_id": self.context.user_id,
+                "contact_number": self.context.user_phone,
+                "date": normalized_date,
+                "time": normalized_time,
+                "datetime": datetime.fromisoformat(
+                    f"{normalized_date}T{normalized_time}"
+                ),
+                "purpose": purpose,
+                "status": "confirmed",
+                "conversation_id": self.context.conversation_id,
+                "created_at": datetime.utcnow(),
+            }
 
-            if datetime_str in booked_slots:
-                logger.debug(f"[book_appointment] Slot {datetime_str} already booked")
-                allowed_slots = self._allowed_slots_for_date(normalized_date)
-                available_slots = [
-                    slot
-                    for slot in allowed_slots
-                    if f"{normalized_date} {slot['time']}" not in booked_slots
-                ]
+            try:
+                appointment_id = await self.db.create_appointment(appointment_data)
+            except DuplicateKeyError:
+                logger.debug(
+                    "[book_appointment] Slot %s %s already booked",
+                    normalized_date,
+                    normalized_time,
+                )
+                self._invalidate_booked_slots(normalized_date)
+                booked_slots = await self._get_booked_slots(normalized_date)
+                available_slots = self._available_slots(normalized_date, booked_slots)
 
                 # Format date for human-readable response
-                date_obj = datetime.strptime(normalized_date, "%Y-%m-%d")
-                date_str = date_obj.strftime("%A, %B %d")
+                date_str = self._format_spoken_date(normalized_date)
 
                 if not available_slots:
                     response = (
@@ -680,7 +985,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                         f"Sorry, {self._format_time_ampm(normalized_time)} on {date_str} is taken. "
                         f"I can do {self._format_slots(available_slots)}. Which time works?"
                     )
-                await self._send_tool_call_event(
+                await self._respond(
                     context,
                     "book_appointment",
                     {
@@ -690,24 +995,10 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                     },
                     response,
                 )
-                await self._say_response(context, response)
                 return None
 
-            # Create appointment
-            appointment_data = {
-                "user_id": self.context.user_id,
-                "contact_number": self.context.user_phone,
-                "date": normalized_date,
-                "time": normalized_time,
-                "datetime": datetime.strptime(
-                    f"{normalized_date} {normalized_time}", "%Y-%m-%d %H:%M"
-                ),
-                "purpose": purpose,
-                "status": "confirmed",
-                "created_at": datetime.utcnow(),
-            }
-
-            appointment_id = await self.db.create_appointment(appointment_data)
+            self._invalidate_booked_slots(normalized_date)
+            self._invalidate_appointments()
 
             # Store in context for summary
             self.context.pending_appointment = {
@@ -727,15 +1018,14 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             )
 
             # Format date for human-readable confirmation
-            date_obj = datetime.strptime(normalized_date, "%Y-%m-%d")
-            date_str = date_obj.strftime("%A, %B %d")
+            date_str = self._format_spoken_date(normalized_date)
 
             response = (
                 f"Perfect! You're all set for {date_str} at {self._format_time_ampm(normalized_time)}. "
                 "Anything else?"
             )
 
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context,
                 "book_appointment",
                 {"date": normalized_date, "time": normalized_time, "purpose": purpose},
@@ -746,7 +1036,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return response
 
         except Exception as e:
-            logger.error(f"[book_appointment] Error: {e}")
+            logger.error("[book_appointment] Error: %s", e)
             response = "Sorry, couldn't book that. Try a different time?"
             await self._say_response(context, response)
             return response
@@ -763,49 +1053,34 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return None
 
         try:
-            appointments = await self.db.get_user_appointments(self.context.user_id)
+            upcoming = await self._get_upcoming_appointments()
 
-            if not appointments:
+            if not upcoming:
                 response = "You don't have any appointments scheduled. Would you like to book one?"
-                await self._send_tool_call_event(
+                await self._respond(
                     context, "retrieve_appointments", {}, response
                 )
-                await self._say_response(context, response)
                 return None
 
-            # Separate upcoming and past appointments
-            now = datetime.utcnow()
-            upcoming = []
-            past = []
-
-            for apt in appointments:
-                if apt["datetime"] > now and apt["status"] != "cancelled":
-                    upcoming.append(apt)
-                else:
-                    past.append(apt)
-
             # Track appointments viewed
             self.context.tracker.track_appointment_viewed(upcoming)
 
-            response_parts = []
-
-            if upcoming:
-                response_parts.append("Your upcoming appointments:")
-                for apt in upcoming[:3]:  # Limit to 3 for brevity
-                    formatted_date = apt["datetime"].strftime("%A, %B %d at %I:%M %p")
-                    response_parts.append(f"{formatted_date} for {apt['purpose']}")
+            response_parts = ["Your upcoming appointments:"]
+            for apt in upcoming:
+                formatted_date = _spoken_datetime(apt.datetime)
+                response_parts.append(f"{formatted_date} for {apt.purpose}")
 
             response = " ".join(response_parts) + ". Need to change anything?"
 
-            await self._send_tool_call_event(
-                context, "retrieve_appointments", {"count": len(appointments)}, response
+            self._send_tool_call_event(
+                context, "retrieve_appointments", {"count": len(upcoming)}, response
             )
 
             # Return full response to LLM
             return response
 
         except Exception as e:
-            logger.error(f"[retrieve_appointments] Error: {e}")
+            logger.error("[retrieve_appointments] Error: %s", e)
             response = "I'm having trouble accessing your appointments right now. Please try again in a moment."
             await self._say_response(context, response)
             return response
@@ -827,9 +1102,12 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             time: Appointment time (HH:MM format)
             cancel_latest: If True, cancel the most recent upcoming appointment
         """
-        logger.debug(
-            f"[cancel_appointment] {appointment_id or f'{date} {time}' or ('latest' if cancel_latest else '')}"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[cancel_appointment] %s",
+                "latest" if cancel_latest
+                else appointment_id or (f"{date} {time}" if date and time else ""),
+            )
 
         if not self.context.user_id:
             logger.warning("[cancel_appointment] User not identified")
@@ -838,28 +1116,23 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return None
 
         try:
-            appointment = None
-
             if cancel_latest:
-                # Get all appointments and find the most recent upcoming one
-                appointments = await self.db.get_user_appointments(self.context.user_id)
-                if appointments:
-                    # Sort by datetime descending and get first upcoming one
-                    now = datetime.utcnow()
-                    upcoming = [
-                        apt
-                        for apt in appointments
-                        if apt["status"] != "cancelled" and apt["datetime"] > now
-                    ]
-                    if upcoming:
-                        upcoming.sort(key=lambda x: x["datetime"])
-                        appointment = upcoming[0]  # Most recent upcoming
+                appointment = await self.db.cancel_next_appointment(
+                    self.context.user_id
+                )
             elif appointment_id:
-                appointment = await self.db.get_appointment_by_id(
+                appointment = await self.db.cancel_appointment_atomic(
                     appointment_id, self.context.user_id
                 )
             elif date and time:
-                appointment = await self.db.get_appointment_by_datetime(
+                normalized_date = await self._normalize_date(date)
+                normalized_time = await self._normalize_time(time)
+                if not normalized_date or not normalized_time:
+                    response = "I didn't catch a valid date and time for that appointment. Which one should I cancel?"
+                    await self._say_response(context, response)
+                    return None
+                date, time = normalized_date, normalized_time
+                appointment = await self.db.cancel_appointment_by_datetime(
                     self.context.user_id, date, time
                 )
             else:
@@ -868,24 +1141,24 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 return None
 
             if not appointment:
-                response = "I couldn't find that appointment. Could you please check the details and try again?"
-                await self._send_tool_call_event(
-                    context,
-                    "cancel_appointment",
-                    {
-                        "appointment_id": appointment_id,
-                        "date": date,
-                        "time": time,
-                        "cancel_latest": cancel_latest,
-                    },
-                    response,
-                )
-                await self._say_response(context, response)
-                return None
+                # Only a miss needs a second read, to tell the two cases apart
+                existing = None
+                if appointment_id:
+                    existing = await self.db.get_appointment_by_id(
+                        appointment_id, self.context.user_id
+                    )
+                elif not cancel_latest:
+                    existing = await self.db.get_appointment_by_datetime(
+                        self.context.user_id, date, time, include_cancelled=True
+                    )
 
-            if appointment["status"] == "cancelled":
-                response = "That appointment is already cancelled."
-                await self._send_tool_call_event(
+                if existing and existing.status is AppointmentStatus.CANCELLED:
+                    response = "That appointment is already cancelled."
+                elif cancel_latest:
+                    response = "You don't have any upcoming appointments to cancel."
+                else:
+                    response = "I couldn't find that appointment. Could you please check the details and try again?"
+                await self._respond(
                     context,
                     "cancel_appointment",
                     {
@@ -896,22 +1169,21 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                     },
                     response,
                 )
-                await self._say_response(context, response)
                 return None
 
-            # Cancel the appointment
-            await self.db.update_appointment_status(appointment["_id"], "cancelled")
+            self._invalidate_booked_slots(appointment.date)
+            self._invalidate_appointments()
 
             # Track cancellation
-            self.context.tracker.track_appointment_cancelled(str(appointment["_id"]))
+            self.context.tracker.track_appointment_cancelled(appointment.id)
 
-            formatted_date = appointment["datetime"].strftime("%A, %B %d at %I:%M %p")
+            formatted_date = _spoken_datetime(appointment.datetime)
 
             response = (
                 f"I've cancelled your appointment on {formatted_date}. Anything else?"
             )
 
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context,
                 "cancel_appointment",
                 {"date": date, "time": time, "cancel_latest": cancel_latest},
@@ -922,7 +1194,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return response
 
         except Exception as e:
-            logger.error(f"[cancel_appointment] Error: {e}")
+            logger.error("[cancel_appointment] Error: %s", e)
             response = "I'm sorry, I couldn't cancel that appointment right now. Please try again."
             await self._say_response(context, response)
             return response
@@ -944,7 +1216,7 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             new_time: New time (HH:MM format)
             new_purpose: New purpose for the appointment
         """
-        logger.debug(f"[modify_appointment] {appointment_id}")
+        logger.debug("[modify_appointment] %s", appointment_id)
 
         if not self.context.user_id:
             logger.warning("[modify_appointment] User not identified")
@@ -952,60 +1224,32 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             await self._say_response(context, response)
             return None
 
-        try:
-            appointment = await self.db.get_appointment_by_id(
-                appointment_id, self.context.user_id
+        # Accept the same phrasings as booking ("tomorrow", "3 PM", ...)
+        normalized_date = await self._normalize_date(new_date) if new_date else None
+        normalized_time = await self._normalize_time(new_time) if new_time else None
+        if (new_date and not normalized_date) or (new_time and not normalized_time):
+            response = "I didn't catch a valid new date and time. Which day and time would you like instead?"
+            await self._respond(
+                context,
+                "modify_appointment",
+                {
+                    "appointment_id": appointment_id,
+                    "new_date": new_date,
+                    "new_time": new_time,
+                },
+                response,
             )
+            return None
 
-            if not appointment:
-                response = "I couldn't find that appointment. Could you please check the appointment ID?"
-                await self._send_tool_call_event(
-                    context,
-                    "modify_appointment",
-                    {"appointment_id": appointment_id},
-                    response,
-                )
-                await self._say_response(context, response)
-                return None
-
-            if appointment["status"] == "cancelled":
-                response = "That appointment is cancelled and cannot be modified. Would you like to book a new one?"
-                await self._send_tool_call_event(
-                    context,
-                    "modify_appointment",
-                    {"appointment_id": appointment_id},
-                    response,
-                )
-                await self._say_response(context, response)
-                return None
+        new_date, new_time = normalized_date, normalized_time
 
+        try:
             updates = {}
 
             if new_date and new_time:
-                # Check if new slot is available
-                datetime_str = f"{new_date} {new_time}"
-                booked_slots = await self.db.get_booked_slots(new_date)
-
-                if datetime_str in booked_slots:
-                    response = f"Sorry, {new_time} on {new_date} is already booked. Please choose a different time."
-                    await self._send_tool_call_event(
-                        context,
-                        "modify_appointment",
-                        {
-                            "appointment_id": appointment_id,
-                            "new_date": new_date,
-                            "new_time": new_time,
-                        },
-                        response,
-                    )
-                    await self._say_response(context, response)
-                    return None
-
                 updates["date"] = new_date
                 updates["time"] = new_time
-                updates["datetime"] = datetime.strptime(
-                    f"{new_date} {new_time}", "%Y-%m-%d %H:%M"
-                )
+                updates["datetime"] = datetime.fromisoformat(f"{new_date}T{new_time}")
 
             if new_purpose:
                 updates["purpose"] = new_purpose
@@ -1015,12 +1259,48 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
                 await self._say_response(context, response)
                 return None
 
-            # Update the appointment
-            await self.db.update_appointment(appointment["_id"], updates)
+            # Update in one round-trip; the unique slot index rejects a move
+            # onto a slot that is already taken
+            try:
+                appointment = await self.db.update_active_appointment(
+                    appointment_id, self.context.user_id, updates
+                )
+            except DuplicateKeyError:
+                response = f"Sorry, {new_time} on {new_date} is already booked. Please choose a different time."
+                await self._respond(
+                    context,
+                    "modify_appointment",
+                    {
+                        "appointment_id": appointment_id,
+                        "new_date": new_date,
+                        "new_time": new_time,
+                    },
+                    response,
+                )
+                return None
+
+            if not appointment:
+                existing = await self.db.get_appointment_by_id(
+                    appointment_id, self.context.user_id
+                )
+                if existing and existing.status is AppointmentStatus.CANCELLED:
+                    response = "That appointment is cancelled and cannot be modified. Would you like to book a new one?"
+                else:
+                    response = "I couldn't find that appointment. Could you please check the appointment ID?"
+                await self._respond(
+                    context,
+                    "modify_appointment",
+                    {"appointment_id": appointment_id},
+                    response,
+                )
+                return None
+
+            self._invalidate_booked_slots(appointment.date, updates.get("date"))
+            self._invalidate_appointments()
 
             # Track modification
             self.context.tracker.track_appointment_modified(
-                str(appointment["_id"]),
+                appointment.id,
                 {
                     "date": updates.get("date"),
                     "time": updates.get("time"),
@@ -1029,14 +1309,12 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             )
 
             if "datetime" in updates:
-                new_date_formatted = updates["datetime"].strftime(
-                    "%A, %B %d at %I:%M %p"
-                )
+                new_date_formatted = _spoken_datetime(updates["datetime"])
                 response = f"Updated! Your appointment is now {new_date_formatted}."
             else:
                 response = f"Updated your appointment purpose to {updates['purpose']}."
 
-            await self._send_tool_call_event(
+            self._send_tool_call_event(
                 context,
                 "modify_appointment",
                 {"appointment_id": appointment_id, "updates": updates},
@@ -1047,43 +1325,64 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             return response
 
         except Exception as e:
-            logger.error(f"[modify_appointment] Error: {e}")
+            logger.error("[modify_appointment] Error: %s", e)
             response = "I'm sorry, I couldn't modify that appointment right now. Please try again."
             await self._say_response(context, response)
             return response
 
+    async def _save_conversation(self, summary_data: Dict, messages_data: Dict) -> None:
+        """Save the conversation summary and messages."""
+        try:
+            # The two inserts target different collections, so issue them together
+            await asyncio.gather(
+                self.db.save_conversation_summary(summary_data),
+                self.db.save_conversation_messages(messages_data),
+            )
+            logger.info(
+                "[end_conversation] Summary saved for user: %s (type: %s)",
+                messages_data["user_id"],
+                summary_data.get("summary_type"),
+            )
+            logger.info(
+                "[end_conversation] %d messages saved for conversation: %s",
+                messages_data["total_messages"],
+                messages_data["conversation_id"],
+            )
+        except Exception as e:
+            logger.error("[end_conversation] Save error: %s", e)
+
     @function_tool
     async def end_conversation(self, context: RunContext) -> str:
         """End the conversation and generate a summary."""
         logger.info("[end_conversation] User initiated conversation end")
 
         try:
+            messages = [msg.to_dict() for msg in self.context.message_history]
             summary_data = await SummaryGenerator.generate_frontend_summary(
                 tracker=self.context.tracker,
-                messages=self.context.message_history,
+                messages=messages,
                 ai_timeout=8.0,
             )
 
             # Save summary to database - always save, use "unknown" if no user ID
             user_id_for_save = self.context.user_id or "unknown"
-            await self.db.save_conversation_summary(summary_data)
-            logger.info(
-                f"[end_conversation] Summary saved for user: {user_id_for_save} (type: {summary_data.get('summary_type')})"
-            )
 
             # Save all conversation messages
             messages_data = {
                 "conversation_id": self.context.conversation_id,
                 "user_id": user_id_for_save,
                 "user_phone": self.context.user_phone or "unknown",
-                "messages": self.context.message_history,
+                "messages": messages,
                 "timestamp": datetime.utcnow(),
-                "total_messages": len(self.context.message_history),
+                "total_messages": len(messages),
             }
-            await self.db.save_conversation_messages(messages_data)
-            logger.info(
-                f"[end_conversation] {len(self.context.message_history)} messages saved for conversation: {self.context.conversation_id}"
-            )
+
+            # Flush in-flight tool-call events so they arrive before the summary
+            await self._drain_background_tasks()
+
+            # Persist in the background while the goodbye is spoken; the copy
+            # keeps the insert's _id out of the frontend event
+            self._spawn(self._save_conversation(dict(summary_data), messages_data))
 
             # Send summary to frontend
             summary_event = {"type": "conversation_summary", "summary": summary_data}
@@ -1099,19 +1398,20 @@ You are Alya, a friendly and efficient appointment booking assistant. Your prima
             await self._say_response(context, response)
 
             # Close the session after a brief delay to allow response to be sent
-            import asyncio
             await asyncio.sleep(0.5)
+            # Let the conversation writes finish before the session goes away
+            await self._drain_background_tasks()
             # Stop the agent session
             try:
                 await self.session.aclose()
                 logger.info("[end_conversation] Session closed successfully")
             except Exception as e:
-                logger.warning(f"[end_conversation] Could not close session: {e}")
+                logger.warning("[end_conversation] Could not close session: %s", e)
 
             return None
 
         except Exception as e:
-            logger.error(f"[end_conversation] Error: {e}")
+            logger.error("[end_conversation] Error: %s", e)
             response = (
                 "Thank you for using our appointment booking service! Have a great day!"
             )
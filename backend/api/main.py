@@ -3,7 +3,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from core.database import DatabaseManager
+from core.database import get_db
 from api.routers import system
 
 # Configure logging
@@ -27,7 +27,7 @@ app.add_middleware(
 )
 
 # Database manager
-db = DatabaseManager()
+db = get_db()
 
 # Include Routers
 app.include_router(system.router)
@@ -1,10 +1,25 @@
+"""
+MongoDB access layer shared by the agent and the API.
+
+Appointment reads return core.models.Appointment objects. Booked-slot
+lookups return sets of HH:MM times per date, so callers test a slot
+with `time in booked` in constant time; they raise on failure instead of
+returning an empty (all-free) result.
+"""
+
+import asyncio
 import os
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 
+from core.models import Appointment, AppointmentStatus
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,30 +28,51 @@ class DatabaseManager:
         self.client = None
         self.db = None
         self.connected = False
+        self._connect_lock = asyncio.Lock()
 
     async def connect(self):
         """Connect to MongoDB"""
         if self.connected:
             return
 
+        async with self._connect_lock:
+            if self.connected:
+                return
+            await self._connect()
+
+    async def _connect(self):
         try:
             mongodb_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
             db_name = os.getenv("MONGODB_DB_NAME", "voice_agent")
 
-            self.client = AsyncIOMotorClient(mongodb_uri)
+            self.client = AsyncIOMotorClient(
+                mongodb_uri,
+                maxPoolSize=50,
+                minPoolSize=5,
+                serverSelectionTimeoutMS=2000,
+                waitQueueTimeoutMS=1000,
+            )
             self.db = self.client[db_name]
 
             # Test connection
             await self.client.admin.command("ping")
-            self.connected = True
 
             # Create indexes
             await self._create_indexes()
+            # Bookings depend on this index, so a failure here aborts the connect
+            await self._ensure_unique_slot_index()
+            self.connected = True
 
             logger.info(f"[Database] Connected to {db_name}")
 
         except Exception as e:
             logger.error(f"[Database] Connection failed: {e}")
+            # Close the half-open client so the next connect attempt does not
+            # leave another connection pool behind
+            if self.client is not None:
+                self.client.close()
+            self.client = None
+            self.db = None
             raise
 
     async def _create_indexes(self):
@@ -46,9 +82,17 @@ class DatabaseManager:
             await self.db.users.create_index("phone", unique=True)
 
             # Appointment indexes
-            await self.db.appointments.create_index([("user_id", 1), ("datetime", 1)])
-            await self.db.appointments.create_index([("date", 1), ("time", 1)])
+            # Serves user appointment lists and the upcoming/next lookups;
+            # supersedes the former (user_id, datetime) prefix index
+            await self.db.appointments.create_index(
+                [("user_id", 1), ("datetime", 1), ("status", 1)]
+            )
+            # Serves lookups of a user's appointment by date and time
+            await self.db.appointments.create_index(
+                [("user_id", 1), ("date", 1), ("time", 1)]
+            )
             await self.db.appointments.create_index("status")
+            await self.db.appointments.create_index([("date", 1), ("status", 1)])
 
             # Conversation summary indexes
             await self.db.conversation_summaries.create_index(
@@ -69,6 +113,91 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"[Database] Index creation error: {e}")
 
+    async def _ensure_unique_slot_index(self):
+        """Create the index that allows one confirmed appointment per slot.
+
+        Bookings rely on its DuplicateKeyError instead of a separate
+        availability read, so any failure is raised rather than logged.
+        """
+        # The index only covers the exact string "confirmed"; lowercase
+        # legacy statuses such as "Confirmed" so it sees them
+        for status in AppointmentStatus:
+            await self.db.appointments.update_many(
+                {
+                    "status": {
+                        "$regex": f"^{status.value}$",
+                        "$options": "i",
+                        "$ne": status.value,
+                    }
+                },
+                {"$set": {"status": status.value}},
+            )
+
+        try:
+            await self.db.appointments.create_index(
+                [("date", 1), ("time", 1)],
+                name="unique_confirmed_slot",
+                unique=True,
+                partialFilterExpression={"status": "confirmed"},
+            )
+        except Exception as e:
+            await self._log_duplicate_slots()
+            logger.error(
+                f"[Database] Unique slot index unavailable, refusing to start: {e}"
+            )
+            raise
+
+        # The unique index replaces the former plain (date, time) index; drop
+        # it only once its replacement exists
+        indexes = await self.db.appointments.index_information()
+        if "date_1_time_1" in indexes:
+            await self.db.appointments.drop_index("date_1_time_1")
+
+    async def _log_duplicate_slots(self):
+        """Log confirmed appointments that share a slot and block the unique index."""
+        try:
+            pipeline = [
+                {"$match": {"status": "confirmed"}},
+                {
+                    "$group": {
+                        "_id": {"date": "$date", "time": "$time"},
+                        "ids": {"$push": "$_id"},
+                        "count": {"$sum": 1},
+                    }
+                },
+                {"$match": {"count": {"$gt": 1}}},
+            ]
+            async for group in self.db.appointments.aggregate(pipeline):
+                slot = group["_id"]
+                ids = ", ".join(str(i) for i in group["ids"])
+                logger.error(
+                    f"[Database] Slot {slot.get('date')} {slot.get('time')} has "
+                    f"{group['count']} confirmed appointments ({ids}); cancel all "
+                    f"but one to allow the unique slot index"
+                )
+        except Exception as e:
+            logger.error(f"[Database] Duplicate slot check error: {e}")
+
+    async def _slot_taken(
+        self, date: str, time: str, exclude_id: Optional[ObjectId] = None
+    ) -> bool:
+        """Whether a slot is held by an appointment the unique index cannot see.
+
+        The index only covers status "confirmed", so completed, no-show and
+        unrecognised statuses are checked here. When moving an appointment
+        (exclude_id set) every other non-cancelled appointment is checked,
+        since the moving document may itself be outside the index.
+        """
+        query = {
+            "date": date,
+            "time": time,
+            "status": {"$nin": ["confirmed", "cancelled"]},
+        }
+        if exclude_id is not None:
+            query["status"] = {"$ne": "cancelled"}
+            query["_id"] = {"$ne": exclude_id}
+        return await self.db.appointments.find_one(query, {"_id": 1}) is not None
+
     async def ensure_connected(self):
         """Ensure database connection is active"""
         if not self.connected:
@@ -131,51 +260,57 @@ class DatabaseManager:
         await self.ensure_connected()
 
         try:
+            if await self._slot_taken(
+                appointment_data.get("date"), appointment_data.get("time")
+            ):
+                raise DuplicateKeyError("Slot is already booked")
+
             result = await self.db.appointments.insert_one(appointment_data)
             return result.inserted_id
 
+        except DuplicateKeyError:
+            raise
+
         except Exception as e:
             logger.error(f"[Database] Create appointment error: {e}")
             raise
 
     async def get_appointment_by_id(
         self, appointment_id: str, user_id: str
-    ) -> Optional[Dict]:
+    ) -> Optional[Appointment]:
         """Get appointment by ID for a specific user"""
         await self.ensure_connected()
 
         try:
-            appointment = await self.db.appointments.find_one(
+            doc = await self.db.appointments.find_one(
                 {"_id": ObjectId(appointment_id), "user_id": user_id}
             )
-            return appointment
+            return Appointment.from_document(doc) if doc else None
 
         except Exception as e:
             logger.error(f"[Database] Get appointment by ID error: {e}")
             return None
 
     async def get_appointment_by_datetime(
-        self, user_id: str, date: str, time: str
-    ) -> Optional[Dict]:
+        self, user_id: str, date: str, time: str, include_cancelled: bool = False
+    ) -> Optional[Appointment]:
         """Get appointment by date and time for a specific user"""
         await self.ensure_connected()
 
         try:
-            appointment = await self.db.appointments.find_one(
-                {
-                    "user_id": user_id,
-                    "date": date,
-                    "time": time,
-                    "status": {"$ne": "cancelled"},
-                }
-            )
-            return appointment
+            query = {"user_id": user_id, "date": date, "time": time}
+            if not include_cancelled:
+                query["status"] = {"$ne": "cancelled"}
+            doc = await self.db.appointments.find_one(query)
+            return Appointment.from_document(doc) if doc else None
 
         except Exception as e:
             logger.error(f"[Database] Get appointment by datetime error: {e}")
             return None
 
-    async def get_user_appointments(self, user_id: str, limit: int = 50) -> List[Dict]:
+    async def get_user_appointments(
+        self, user_id: str, limit: int = 50
+    ) -> List[Appointment]:
         """Get all appointments for a user"""
         await self.ensure_connected()
 
@@ -186,29 +321,62 @@ class DatabaseManager:
                 .limit(limit)
             )
 
-            appointments = await cursor.to_list(length=limit)
-            return appointments
+            return [Appointment.from_document(doc) async for doc in cursor]
 
         except Exception as e:
             logger.error(f"[Database] Get user appointments error: {e}")
             return []
 
-    async def get_booked_slots(self, date: str) -> List[str]:
-        """Get all booked slots for a specific date"""
+    async def get_upcoming_appointments(
+        self, user_id: str, limit: int = 3
+    ) -> List[Appointment]:
+        """Get a user's next active appointments, soonest first"""
+        await self.ensure_connected()
+
+        try:
+            cursor = (
+                self.db.appointments.find(
+                    {
+                        "user_id": user_id,
+                        "datetime": {"$gt": datetime.utcnow()},
+                        "status": {"$ne": "cancelled"},
+                    }
+                )
+                .sort("datetime", 1)
+                .limit(limit)
+            )
+
+            return [Appointment.from_document(doc) async for doc in cursor]
+
+        except Exception as e:
+            logger.error(f"[Database] Get upcoming appointments error: {e}")
+            return []
+
+    async def get_booked_slots(self, date: str) -> Set[str]:
+        """Get the booked HH:MM times for a specific date"""
+        booked = await self.get_booked_slots_bulk([date])
+        return booked.get(date, set())
+
+    async def get_booked_slots_bulk(self, dates: List[str]) -> Dict[str, Set[str]]:
+        """Get booked HH:MM times for several dates in a single query"""
         await self.ensure_connected()
 
         try:
             cursor = self.db.appointments.find(
-                {"date": date, "status": {"$ne": "cancelled"}}
+                {"date": {"$in": dates}, "status": {"$ne": "cancelled"}},
+                {"date": 1, "time": 1, "_id": 0},
             )
 
-            appointments = await cursor.to_list(length=None)
-            booked_slots = [f"{apt['date']} {apt['time']}" for apt in appointments]
-            return booked_slots
+            booked_slots = defaultdict(set)
+            async for apt in cursor:
+                booked_slots[apt["date"]].add(apt["time"])
+            return dict(booked_slots)
 
         except Exception as e:
+            # Raise rather than return an empty result, which would read as
+            # every slot being free
             logger.error(f"[Database] Get booked slots error: {e}")
-            return []
+            raise
 
     async def update_appointment(self, appointment_id: ObjectId, updates: Dict) -> bool:
         """Update appointment details"""
@@ -225,6 +393,41 @@ class DatabaseManager:
             logger.error(f"[Database] Update appointment error: {e}")
             return False
 
+    async def update_active_appointment(
+        self, appointment_id: str, user_id: str, updates: Dict
+    ) -> Optional[Appointment]:
+        """Apply updates to a user's non-cancelled appointment in one round-trip.
+
+        Returns the appointment as it was before the update, or None if no
+        active appointment matched. Raises DuplicateKeyError if the new slot
+        is already taken.
+        """
+        await self.ensure_connected()
+
+        try:
+            if "date" in updates and "time" in updates and await self._slot_taken(
+                updates["date"], updates["time"], exclude_id=ObjectId(appointment_id)
+            ):
+                raise DuplicateKeyError("Slot is already booked")
+
+            doc = await self.db.appointments.find_one_and_update(
+                {
+                    "_id": ObjectId(appointment_id),
+                    "user_id": user_id,
+                    "status": {"$ne": "cancelled"},
+                },
+                {"$set": {**updates, "updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.BEFORE,
+            )
+            return Appointment.from_document(doc) if doc else None
+
+        except DuplicateKeyError:
+            raise
+
+        except Exception as e:
+            logger.error(f"[Database] Update active appointment error: {e}")
+            return None
+
     async def update_appointment_status(
         self, appointment_id: ObjectId, status: str
     ) -> bool:
@@ -242,6 +445,46 @@ class DatabaseManager:
             logger.error(f"[Database] Update appointment status error: {e}")
             return False
 
+    async def _cancel_one(self, query: Dict, sort=None) -> Optional[Appointment]:
+        """Cancel the first active appointment matching query in one round-trip"""
+        await self.ensure_connected()
+
+        try:
+            doc = await self.db.appointments.find_one_and_update(
+                {**query, "status": {"$ne": "cancelled"}},
+                {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}},
+                sort=sort,
+                return_document=ReturnDocument.AFTER,
+            )
+            return Appointment.from_document(doc) if doc else None
+
+        except Exception as e:
+            logger.error(f"[Database] Cancel appointment error: {e}")
+            return None
+
+    async def cancel_appointment_atomic(
+        self, appointment_id: str, user_id: str
+    ) -> Optional[Appointment]:
+        """Cancel an appointment by ID; None if not found or already cancelled"""
+        try:
+            oid = ObjectId(appointment_id)
+        except Exception:
+            return None
+        return await self._cancel_one({"_id": oid, "user_id": user_id})
+
+    async def cancel_appointment_by_datetime(
+        self, user_id: str, date: str, time: str
+    ) -> Optional[Appointment]:
+        """Cancel an appointment by date and time; None if no active match"""
+        return await self._cancel_one({"user_id": user_id, "date": date, "time": time})
+
+    async def cancel_next_appointment(self, user_id: str) -> Optional[Appointment]:
+        """Cancel the user's soonest upcoming appointment; None if there is none"""
+        return await self._cancel_one(
+            {"user_id": user_id, "datetime": {"$gt": datetime.utcnow()}},
+            sort=[("datetime", 1)],
+        )
+
     # Conversation summary operations
     async def save_conversation_summary(self, summary_data: Dict) -> ObjectId:
         """Save conversation summary"""
@@ -307,3 +550,14 @@ class DatabaseManager:
             self.client.close()
             self.connected = False
             logger.info("[Database] Connection closed")
+
+
+_instance: Optional[DatabaseManager] = None
+
+
+def get_db() -> DatabaseManager:
+    """Return the process-wide DatabaseManager so every caller shares one pool"""
+    global _instance
+    if _instance is None:
+        _instance = DatabaseManager()
+    return _instance
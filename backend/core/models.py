@@ -1,9 +1,13 @@
+import logging
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 
 
+logger = logging.getLogger(__name__)
+
+
 class AppointmentStatus(Enum):
     CONFIRMED = "confirmed"
     CANCELLED = "cancelled"
@@ -31,7 +35,20 @@ class User:
         }
 
 
-@dataclass
+def _parse_status(value: Any, doc_id: Any = None) -> AppointmentStatus:
+    """Map a stored status string to AppointmentStatus, tolerating legacy values."""
+    try:
+        return AppointmentStatus(str(value or "confirmed").lower())
+    except ValueError:
+        # Non-cancelled documents are treated as active, matching the
+        # status != "cancelled" filters used by the queries
+        logger.warning(
+            f"[Models] Unknown appointment status {value!r} on {doc_id}; treating as confirmed"
+        )
+        return AppointmentStatus.CONFIRMED
+
+
+@dataclass(slots=True, frozen=True)
 class Appointment:
     user_id: str
     date: str  # YYYY-MM-DD format
@@ -42,6 +59,22 @@ class Appointment:
     notes: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    id: Optional[str] = None  # MongoDB _id as a string
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "Appointment":
+        return cls(
+            user_id=doc["user_id"],
+            date=doc["date"],
+            time=doc["time"],
+            datetime=doc["datetime"],
+            purpose=doc.get("purpose", ""),
+            status=_parse_status(doc.get("status"), doc.get("_id")),
+            notes=doc.get("notes"),
+            created_at=doc.get("created_at"),
+            updated_at=doc.get("updated_at"),
+            id=str(doc["_id"]) if "_id" in doc else None,
+        )
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -17,7 +17,7 @@ except ImportError:
 logger = logging.getLogger("summary_service")
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationEvent:
     """Represents a significant event in the conversation"""
 
@@ -28,7 +28,7 @@ class ConversationEvent:
     details: Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationTracker:
     """Tracks conversation context for enhanced summary generation"""
 
@@ -43,7 +43,7 @@ class ConversationTracker:
 
     # Track appointments discussed
     appointments_booked: List[Dict] = field(default_factory=list)
-    appointments_viewed: List[Dict] = field(default_factory=list)
+    appointments_viewed: List[Any] = field(default_factory=list)
     appointments_modified: List[Dict] = field(default_factory=list)
     appointments_cancelled: List[Dict] = field(default_factory=list)
 
@@ -68,7 +68,7 @@ class ConversationTracker:
         self.appointments_booked.append(appointment)
         self.add_event("appointment_booked", appointment)
 
-    def track_appointment_viewed(self, appointments: List[Dict]):
+    def track_appointment_viewed(self, appointments: List[Any]):
         """Track when appointments are viewed"""
         self.appointments_viewed.extend(appointments)
         self.add_event("appointments_viewed", {"count": len(appointments)})